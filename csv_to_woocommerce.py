@@ -6,13 +6,76 @@ Convierte archivo CSV con múltiples páginas a formato compatible con WooCommer
 """
 
 import pandas as pd
+import numpy as np
 import sys
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import urllib.parse
 import re
 import json
+import zlib
+import codecs
+import logging
+import functools
+import csv
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
+from types import MappingProxyType
+
+try:
+    # PyArrow es opcional: si está instalado se usa su escritor CSV nativo
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+try:
+    # orjson es opcional: si está instalado se usa para leer/escribir el cache de imágenes
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tipo para columnas de texto: Arrow guarda las cadenas contiguas y los métodos .str trabajan en nativo
+DTYPE_TEXTO = 'string[pyarrow]' if pa is not None else 'string'
+
+log = logging.getLogger(__name__)
+
+# Imágenes mayores que esto (bytes) se descargan por bloques en lugar de en memoria
+TAMANO_MAXIMO_EN_MEMORIA = 1024 * 1024
+
+# Colores de fondo para las imágenes placeholder
+_PALETTE = ('FF6B6B', '4ECDC4', '45B7D1', 'FFA07A', '98D8C8', 'F7DC6F', 'BB8FCE', '85C1E9')
+# La paleta tiene un tamaño potencia de dos para elegir el color con una máscara en lugar de un módulo
+_PALETTE_MASK = len(_PALETTE) - 1
+assert len(_PALETTE) & _PALETTE_MASK == 0, "El tamaño de _PALETTE debe ser potencia de dos"
+# Parte fija de la URL de DummyImage.com para cada color (solo falta añadir el texto)
+_PLACEHOLDER_PREFIXES = tuple(f"https://dummyimage.com/400x400/{color}/ffffff&text=" for color in _PALETTE)
+
+# Expresiones regulares para limpiar nombres de productos (compiladas una sola vez)
+_RE_NONWORD = re.compile(r'[^\w\s-]')
+_RE_DIGITS = re.compile(r'\b\d+\b')
+_RE_DASHES = re.compile(r'[-\s]+')
+
+@functools.lru_cache(maxsize=4096)
+def url_placeholder(product_name):
+    """
+    Genera la URL de DummyImage.com para un producto (función pura: se memoiza por nombre)
+    
+    Args:
+        product_name (str): Nombre del producto
+    
+    Returns:
+        str: URL de la imagen placeholder
+    """
+    # Generar color basado en el nombre del producto (CRC32: estable entre ejecuciones)
+    product_hash = zlib.crc32(product_name.encode('utf-8'))
+    
+    # Crear texto corto para la imagen
+    text = urllib.parse.quote_plus(product_name[:8].upper())
+    
+    return _PLACEHOLDER_PREFIXES[product_hash & _PALETTE_MASK] + text
 
 class ImageFetcher:
     """
@@ -20,22 +83,42 @@ class ImageFetcher:
     """
     def __init__(self):
         self.cache_file = 'image_cache.json'
-        self.cache = self.load_cache()
+        self._cache = None  # Se carga la primera vez que se usa (la descarga de imágenes no lo necesita)
+        self._dirty = False  # True solo si el cache cambió desde que se cargó
         self.images_folder = 'product_images'  # Nueva carpeta para imágenes locales
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'WooCommerce-CSV-Converter/1.0'
         })
         
+        # Reutilizar conexiones (keep-alive) y reintentar errores temporales del servidor
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=50,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
         # Crear carpeta de imágenes si no existe
         if not os.path.exists(self.images_folder):
             os.makedirs(self.images_folder)
             print(f"📁 Carpeta creada: {self.images_folder}")
     
+    @property
+    def cache(self):
+        """Cache de URLs por producto, cargado desde archivo la primera vez que se consulta"""
+        if self._cache is None:
+            self._cache = self.load_cache()
+        return self._cache
+    
     def load_cache(self):
         """Carga el cache de imágenes desde archivo"""
         if os.path.exists(self.cache_file):
             try:
+                if orjson is not None:
+                    with open(self.cache_file, 'rb') as f:
+                        return orjson.loads(f.read())
                 with open(self.cache_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except:
@@ -43,12 +126,39 @@ class ImageFetcher:
         return {}
     
     def save_cache(self):
-        """Guarda el cache de imágenes en archivo"""
+        """
+        Guarda el cache de imágenes en archivo, solo si cambió
+        
+        Se escribe en un archivo temporal y se reemplaza el original de forma atómica,
+        así una interrupción a mitad de escritura no deja el cache corrupto.
+        
+        Returns:
+            bool: True si se escribió el archivo
+        """
+        if not self._dirty:
+            return False
+        
+        tmp_file = self.cache_file + '.tmp'
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
+            # Sin sangría: el archivo ocupa bastante menos y se escribe/lee más rápido
+            if orjson is not None:
+                with open(tmp_file, 'wb') as f:
+                    f.write(orjson.dumps(self.cache))
+            else:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.cache, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = False
+            return True
         except Exception as e:
-            print(f"⚠️  Advertencia: No se pudo guardar el cache de imágenes: {e}")
+            log.warning("⚠️  Advertencia: No se pudo guardar el cache de imágenes: %s", e)
+            return False
+    
+    def _update_cache(self, cache_key, value):
+        """Actualiza una entrada del cache y lo marca como modificado si cambió"""
+        if self.cache.get(cache_key) != value or cache_key not in self.cache:
+            self.cache[cache_key] = value
+            self._dirty = True
     
     def clean_product_name_for_search(self, product_name):
         """Limpia el nombre del producto para una mejor búsqueda"""
@@ -59,74 +169,26 @@ class ImageFetcher:
         cleaned = product_name.lower().strip()
         
         # Remover caracteres especiales y números sueltos
-        cleaned = re.sub(r'[^\w\s-]', ' ', cleaned)
-        cleaned = re.sub(r'\b\d+\b', '', cleaned)
+        cleaned = _RE_NONWORD.sub(' ', cleaned)
+        cleaned = _RE_DIGITS.sub('', cleaned)
         
         # Remover palabras muy cortas y espacios extra
         words = [word for word in cleaned.split() if len(word) > 2]
         
         return ' '.join(words[:3])  # Máximo 3 palabras para mejor búsqueda
     
-    def get_unsplash_image(self, product_name):
-        """
-        Obtiene imagen desde Unsplash usando su API pública (sin API key)
-        Utiliza la función de búsqueda de Unsplash Source
-        """
-        # Nota: Deshabilitado temporalmente debido a problemas de conectividad
-        return None
-    
-    def get_picsum_image(self, product_name):
-        """
-        Obtiene imagen placeholder desde Lorem Picsum
-        """
-        # Nota: Deshabilitado temporalmente debido a problemas de conectividad
-        return None
-    
-    def get_placeholder_image(self, product_name):
-        """
-        Obtiene imagen placeholder simple y confiable
-        """
-        try:
-            # Generar color basado en el nombre del producto
-            product_hash = abs(hash(product_name)) % 16777215  # Color hexadecimal
-            color = f"{product_hash:06x}"
-            
-            # Usar placeholder.com que es muy confiable
-            text = urllib.parse.quote(product_name[:10].replace(' ', '+'))
-            url = f"https://via.placeholder.com/400x400/{color}/ffffff?text={text}"
-            
-            print(f"   🔍 Probando Placeholder URL: {url}")
-            
-            # Esta URL siempre funciona, no necesitamos verificar
-            print(f"   ✅ Placeholder OK: {url}")
-            return url
-                
-        except Exception as e:
-            print(f"   ⚠️  Error con Placeholder para '{product_name}': {e}")
-        
-        return None
-    
     def get_simple_placeholder_image(self, product_name):
         """
         Genera una URL de imagen placeholder simple y confiable
         """
         try:
-            # Generar color basado en el nombre del producto
-            product_hash = abs(hash(product_name))
-            color_codes = ['FF6B6B', '4ECDC4', '45B7D1', 'FFA07A', '98D8C8', 'F7DC6F', 'BB8FCE', '85C1E9']
-            color = color_codes[product_hash % len(color_codes)]
-            
-            # Crear texto corto para la imagen
-            text = product_name[:8].replace(' ', '+').upper()
-            
-            # Usar DummyImage.com que es muy estable
-            url = f"https://dummyimage.com/400x400/{color}/ffffff&text={text}"
+            url = url_placeholder(product_name)
             
-            print(f"   🎨 Generando placeholder: {url}")
+            log.debug("   🎨 Generando placeholder: %s", url)
             return url
                 
         except Exception as e:
-            print(f"   ⚠️  Error generando placeholder para '{product_name}': {e}")
+            log.warning("   ⚠️  Error generando placeholder para '%s': %s", product_name, e)
             # Fallback: URL estática básica
             return "https://dummyimage.com/400x400/cccccc/ffffff&text=Producto"
     
@@ -142,98 +204,141 @@ class ImageFetcher:
         if cache_key in self.cache:
             cached_url = self.cache[cache_key]
             if cached_url:  # Solo retornar si hay URL válida
-                print(f"   💾 Imagen en cache para: {product_name}")
+                log.debug("   💾 Imagen en cache para: %s", product_name)
                 return cached_url
         
-        print(f"   🔍 Buscando imagen para: {product_name}")
+        log.debug("   🔍 Buscando imagen para: %s", product_name)
         
-        # Intentar obtener imagen de Unsplash primero
-        image_url = self.get_unsplash_image(product_name)
-        
-        # Si falla, usar imagen de Picsum
-        if not image_url:
-            print(f"   ⏭️  Unsplash falló, probando Picsum...")
-            image_url = self.get_picsum_image(product_name)
-        
-        # Si todo falla, usar placeholder confiable
-        if not image_url:
-            print(f"   ⏭️  Picsum falló, usando placeholder simple...")
-            image_url = self.get_simple_placeholder_image(product_name)
+        # Usar placeholder confiable
+        image_url = self.get_simple_placeholder_image(product_name)
         
         # Guardar en cache (incluso si es None para evitar buscar de nuevo)
-        self.cache[cache_key] = image_url
+        self._update_cache(cache_key, image_url)
         
         if image_url:
-            print(f"   ✅ Imagen final: {image_url}")
+            log.debug("   ✅ Imagen final: %s", image_url)
         else:
-            print(f"   ❌ No se pudo obtener imagen")
+            log.warning("   ❌ No se pudo obtener imagen")
         
         return image_url
     
-    def download_image_locally(self, image_url, product_name, product_id):
+    def _expected_filepath(self, safe_name, product_id):
+        """
+        Ruta local de la imagen de un producto (determinista a partir del nombre seguro y el ID)
+        """
+        filename = f"producto-{product_id:04d}-{safe_name}.jpg"
+        return os.path.join(self.images_folder, filename)
+    
+    def download_image_locally(self, image_url, filepath):
         """
         Descarga una imagen y la guarda localmente
+        
+        Args:
+            image_url (str): URL de la imagen
+            filepath (str): Ruta local de destino (ver _expected_filepath); quien llama ya comprobó que no existe
         """
         try:
-            # Generar nombre de archivo seguro
-            safe_name = re.sub(r'[^\w\s-]', '', product_name.lower())
-            safe_name = re.sub(r'[-\s]+', '-', safe_name)
-            filename = f"producto-{product_id:04d}-{safe_name[:20]}.jpg"
-            filepath = os.path.join(self.images_folder, filename)
-            
-            # Si el archivo ya existe, retornar la ruta
-            if os.path.exists(filepath):
-                print(f"   📁 Imagen local existente: {filename}")
-                return filepath
+            log.debug("   ⬇️  Descargando imagen: %s", os.path.basename(filepath))
             
-            print(f"   ⬇️  Descargando imagen: {filename}")
-            
-            # Descargar la imagen
+            # Descargar la imagen (stream=True solo lee las cabeceras; el cuerpo se lee abajo)
             response = self.session.get(image_url, timeout=10, stream=True)
             response.raise_for_status()
             
-            # Guardar la imagen
+            # Guardar la imagen: los placeholders pesan pocos KB y se escriben de una vez,
+            # solo los archivos grandes se copian por bloques
+            content_length = int(response.headers.get('Content-Length') or 0)
             with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+                if content_length > TAMANO_MAXIMO_EN_MEMORIA:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+                else:
+                    f.write(response.content)
             
-            print(f"   ✅ Imagen descargada: {filepath}")
+            log.debug("   ✅ Imagen descargada: %s", filepath)
             return filepath
             
         except Exception as e:
-            print(f"   ❌ Error descargando imagen: {e}")
+            log.warning("   ❌ Error descargando imagen: %s", e)
             return None
     
-    def get_woocommerce_compatible_image(self, product_name, product_id):
+    def get_woocommerce_compatible_image(self, product_name, product_id, safe_name=None):
         """
         Obtiene una imagen compatible con WooCommerce (descargada localmente)
+        
+        Args:
+            product_name (str): Nombre del producto
+            product_id (int): ID del producto
+            safe_name (str): Nombre de archivo seguro ya calculado (ver nombres_seguros)
         """
         if not product_name or not product_name.strip():
             return None
         
-        # Verificar cache
-        cache_key = f"{product_name.strip().lower()}_{product_id}"
-        if cache_key in self.cache:
-            cached_path = self.cache[cache_key]
-            if cached_path and os.path.exists(cached_path):
-                print(f"   💾 Imagen local en cache: {cached_path}")
-                return cached_path
+        if safe_name is None:
+            safe_name = nombres_seguros([product_name])[0]
+        
+        # La ruta es determinista: si el archivo ya existe no hace falta consultar el cache
+        filepath = self._expected_filepath(safe_name, product_id)
+        if os.path.exists(filepath):
+            log.debug("   📁 Imagen local existente: %s", filepath)
+            return filepath
         
-        print(f"   🔍 Procesando imagen para: {product_name}")
+        log.debug("   🔍 Procesando imagen para: %s", product_name)
         
         # Generar URL de placeholder
         image_url = self.get_simple_placeholder_image(product_name)
         
         if image_url:
             # Descargar imagen localmente
-            local_path = self.download_image_locally(image_url, product_name, product_id)
-            
-            if local_path:
-                # Guardar en cache
-                self.cache[cache_key] = local_path
-                return local_path
+            return self.download_image_locally(image_url, filepath)
         
         return None
+    
+    def fetch_all(self, items, max_workers=16):
+        """
+        Obtiene las imágenes de varios productos con descargas simultáneas
+        
+        Args:
+            items (list): Tuplas (product_name, product_id, safe_name)
+            max_workers (int): Máximo de descargas en curso a la vez
+        
+        Returns:
+            dict: Ruta local de la imagen (o None) por product_id
+        """
+        total = len(items)
+        results = {}
+        
+        # requests libera el GIL mientras espera la red y la sesión comparte su pool de conexiones entre hilos
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.get_woocommerce_compatible_image, product_name, product_id, safe_name): product_id
+                for product_name, product_id, safe_name in items
+            }
+            
+            for completed, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                
+                # Progreso cada 100 imágenes en lugar de varias líneas por producto
+                if completed % 100 == 0 or completed == total:
+                    print(f"   🖼️  Imágenes procesadas: {completed}/{total}")
+        
+        return results
+
+def nombres_seguros(nombres):
+    """
+    Genera de una sola vez los nombres de archivo seguros de las imágenes
+    
+    Args:
+        nombres: Secuencia con los nombres de los productos
+    
+    Returns:
+        list: Nombre seguro (máximo 20 caracteres) de cada producto
+    """
+    # dtype object para usar el motor re de Python: con strings de Arrow (RE2) \w solo
+    # reconoce ASCII y se perderían acentos y eñes de los nombres de archivo ya existentes
+    nombres = pd.Series(nombres, dtype=object).str.lower()
+    nombres = nombres.str.replace(_RE_NONWORD, '', regex=True)
+    nombres = nombres.str.replace(_RE_DASHES, '-', regex=True)
+    return nombres.str[:20].tolist()
 
 def leer_csv_con_paginas(archivo_csv):
     """
@@ -250,13 +355,11 @@ def leer_csv_con_paginas(archivo_csv):
         # Intentamos leer el archivo como Excel primero (si tiene múltiples hojas)
         if archivo_csv.endswith(('.xlsx', '.xls')):
             print("Detectado archivo Excel, leyendo todas las hojas...")
-            xl_file = pd.ExcelFile(archivo_csv)
-            paginas_data = {}
+            # sheet_name=None lee todas las hojas en una sola pasada sobre el libro
+            paginas_data = pd.read_excel(archivo_csv, sheet_name=None)
             
-            for nombre_pagina in xl_file.sheet_names:
+            for nombre_pagina in paginas_data:
                 print(f"Leyendo página: {nombre_pagina}")
-                df = pd.read_excel(archivo_csv, sheet_name=nombre_pagina)
-                paginas_data[nombre_pagina] = df
                 
             return paginas_data
             
@@ -272,61 +375,161 @@ def leer_csv_con_paginas(archivo_csv):
         print(f"Error al leer el archivo: {e}")
         return None
 
-def verificar_estructura_datos(paginas_data):
+# Columnas que debe tener cada página del archivo original
+COLUMNAS_ESPERADAS = ('PRODUCTO', 'PRECIO', '0,3', 'TOTAL')
+
+def verificar_estructura_datos(paginas_data, detallado=False):
     """
     Verifica que los datos tengan la estructura esperada
     
     Args:
         paginas_data (dict): Datos de las páginas
+        detallado (bool): Si es True, muestra las primeras filas de cada página
     
     Returns:
         bool: True si la estructura es correcta
     """
-    columnas_esperadas = ['PRODUCTO', 'PRECIO', '0,3', 'TOTAL']
-    
     for nombre_pagina, df in paginas_data.items():
         print(f"\n--- Verificando página: {nombre_pagina} ---")
         print(f"Número de filas: {len(df)}")
         print(f"Columnas encontradas: {list(df.columns)}")
         
-        # Verificar si tiene las columnas esperadas
-        columnas_faltantes = []
-        for col in columnas_esperadas:
-            if col not in df.columns:
-                columnas_faltantes.append(col)
+        # Verificar si tiene las columnas esperadas (un solo set por página)
+        columnas_presentes = set(df.columns)
+        columnas_faltantes = [col for col in COLUMNAS_ESPERADAS if col not in columnas_presentes]
         
         if columnas_faltantes:
             print(f"⚠️  Columnas faltantes: {columnas_faltantes}")
         else:
             print("✅ Todas las columnas esperadas están presentes")
             
-        # Mostrar primeras filas para verificar formato
-        print("Primeras 3 filas:")
-        print(df.head(3))
+        # Mostrar primeras filas para verificar formato (formatear el DataFrame es costoso)
+        if detallado:
+            print("Primeras 3 filas:")
+            print(df.head(3))
         
     return True
 
+# A partir de este número de productos compensa repartir las páginas entre varios procesos
+FILAS_MINIMAS_PARALELO = 200_000
+
+# Estructura de columnas requerida por WooCommerce (inmutable, se crea una sola vez)
+COLUMNAS_WC = (
+    'ID', 'Tipo', 'SKU', 'GTIN', 'Nombre', 'Publicado', '¿Está destacado?', 
+    'Visibilidad en el catálogo', 'Descripción corta', 'Descripción', 
+    'Día en que empieza el precio rebajado', 'Día en que termina el precio rebajado',
+    'Estado del impuesto', 'Clase de impuesto', '¿Existencias?', 'Inventario',
+    'Cantidad de bajo inventario', '¿Permitir reservas de productos agotados?',
+    '¿Vendido individualmente?', 'Peso (kg)', 'Longitud (cm)', 'Anchura (cm)',
+    'Altura (cm)', '¿Permitir valoraciones de clientes?', 'Nota de compra',
+    'Precio rebajado', 'Precio normal', 'Categorías', 'Etiquetas', 
+    'Clase de envío', 'Imágenes', 'Límite de descargas',
+    'Días de caducidad de la descarga', 'Superior', 'Productos agrupados',
+    'Ventas dirigidas', 'Ventas cruzadas', 'URL externa', 'Texto del botón',
+    'Posición', 'Marcas'
+)
+
+# Columnas con el mismo valor para todos los productos (plantilla de solo lectura, se crea una sola vez)
+PLANTILLA_PRODUCTO_WC = MappingProxyType({
+    'Tipo': 'simple',
+    'GTIN': '',
+    'Publicado': 1,
+    '¿Está destacado?': 0,
+    'Visibilidad en el catálogo': 'visible',
+    'Día en que empieza el precio rebajado': '',
+    'Día en que termina el precio rebajado': '',
+    'Estado del impuesto': 'taxable',
+    'Clase de impuesto': 'standard',
+    '¿Existencias?': 1,
+    'Inventario': 100,  # Valor por defecto
+    'Cantidad de bajo inventario': 5,
+    '¿Permitir reservas de productos agotados?': 0,
+    '¿Vendido individualmente?': 0,
+    'Peso (kg)': '',
+    'Longitud (cm)': '',
+    'Anchura (cm)': '',
+    'Altura (cm)': '',
+    '¿Permitir valoraciones de clientes?': 1,
+    'Nota de compra': '',
+    'Precio rebajado': '',
+    'Clase de envío': '',
+    'Límite de descargas': '',
+    'Días de caducidad de la descarga': '',
+    'Superior': '',
+    'Productos agrupados': '',
+    'Ventas dirigidas': '',
+    'Ventas cruzadas': '',
+    'URL externa': '',
+    'Texto del botón': '',
+    'Marcas': ''
+})
+
 def crear_estructura_woocommerce():
     """
     Define la estructura de columnas requerida por WooCommerce
     
     Returns:
-        list: Lista de nombres de columnas para WooCommerce
+        tuple: Nombres de columnas para WooCommerce
+    """
+    return COLUMNAS_WC
+
+def calcular_precios_base(totales):
+    """
+    Calcula el precio base (TOTAL / 1.03) para una columna completa de totales
+    
+    Args:
+        totales (pd.Series): Columna TOTAL tal y como se leyó del archivo original
+    
+    Returns:
+        np.ndarray: Precios base redondeados a 2 decimales (0 si el total no es válido)
     """
-    return [
-        'ID', 'Tipo', 'SKU', 'GTIN', 'Nombre', 'Publicado', '¿Está destacado?', 
-        'Visibilidad en el catálogo', 'Descripción corta', 'Descripción', 
-        'Día en que empieza el precio rebajado', 'Día en que termina el precio rebajado',
-        'Estado del impuesto', 'Clase de impuesto', '¿Existencias?', 'Inventario',
-        'Cantidad de bajo inventario', '¿Permitir reservas de productos agotados?',
-        '¿Vendido individualmente?', 'Peso (kg)', 'Longitud (cm)', 'Anchura (cm)',
-        'Altura (cm)', '¿Permitir valoraciones de clientes?', 'Nota de compra',
-        'Precio rebajado', 'Precio normal', 'Categorías', 'Etiquetas', 
-        'Clase de envío', 'Imágenes', 'Límite de descargas',
-        'Días de caducidad de la descarga', 'Superior', 'Productos agrupados',
-        'Ventas dirigidas', 'Ventas cruzadas', 'URL externa', 'Texto del botón',
-        'Posición', 'Marcas'
-    ]
+    if pd.api.types.is_numeric_dtype(totales) and not pd.api.types.is_bool_dtype(totales):
+        # Excel ya entregó la columna como números: no hace falta pasar por texto
+        precios_total = totales
+    else:
+        # Limpiar formato: remover espacios (incluidos los no separables de Excel) y €, y convertir comas a puntos
+        totales_limpios = (
+            totales.astype(str)
+            .str.replace('[€\\s\u00a0]', '', regex=True)
+            .str.replace(',', '.', regex=False)
+        )
+        
+        # '#VALUE!', 'nan', '' y cualquier otro texto no numérico se convierten en NaN
+        precios_total = pd.to_numeric(totales_limpios, errors='coerce')
+    
+    # Totales no válidos o no positivos quedan con precio 0 (una sola máscara, sin try/except)
+    invalidos = precios_total.isna() | (precios_total <= 0)
+    precios_base = (precios_total / 1.03).round(2).where(~invalidos, 0)
+    return precios_base.to_numpy()
+
+def procesar_pagina(nombre_pagina, productos, totales):
+    """
+    Construye las columnas de WooCommerce que dependen de una página
+    
+    Las columnas constantes, ID, SKU, Imágenes y Posición se asignan después
+    de unir todas las páginas.
+    
+    Args:
+        nombre_pagina (str): Nombre de la página (categoría)
+        productos (pd.Series): Columna PRODUCTO sin filas vacías
+        totales (pd.Series): Columna TOTAL de esos mismos productos
+    
+    Returns:
+        pd.DataFrame: Productos de la página
+    """
+    # Construir cada columna de la página de una sola vez
+    nombres = productos.astype(DTYPE_TEXTO).str.strip()
+    descripciones = 'Producto ' + nombres + f" de la categoría {nombre_pagina}"
+    precios_base = calcular_precios_base(totales)
+    
+    return pd.DataFrame({
+        'Nombre': nombres.to_numpy(),
+        'Descripción corta': f"Producto de la categoría {nombre_pagina}",
+        'Descripción': descripciones.to_numpy(),
+        'Precio normal': precios_base,
+        'Categorías': nombre_pagina,
+        'Etiquetas': nombre_pagina.lower().replace(' ', '-'),
+    })
 
 def procesar_datos_a_woocommerce(paginas_data, solo_ejemplo=False, agregar_imagenes=False):
     """
@@ -351,9 +554,10 @@ def procesar_datos_a_woocommerce(paginas_data, solo_ejemplo=False, agregar_image
     else:
         image_fetcher = None
     
-    # Crear lista para almacenar todos los productos
-    productos_woocommerce = []
-    contador_id = 1
+    # Crear listas con los productos seleccionados de cada página
+    nombres_paginas = []
+    productos_paginas = []
+    totales_paginas = []
     productos_procesados = 0
     max_productos = 100 if solo_ejemplo else float('inf')
     
@@ -363,105 +567,81 @@ def procesar_datos_a_woocommerce(paginas_data, solo_ejemplo=False, agregar_image
             
         print(f"Procesando página: {nombre_pagina} ({len(df)} productos)")
         
-        # Limpiar datos: eliminar filas vacías
-        df_limpio = df.dropna(subset=['PRODUCTO'])
+        # Sin columna TOTAL no se puede calcular el precio de ningún producto de la página
+        if 'TOTAL' not in df.columns:
+            print(f"⚠️  Página {nombre_pagina} sin columna TOTAL, se omite")
+            continue
         
         # Si es modo ejemplo, tomar solo algunos productos de cada categoría
+        filas = df
         if solo_ejemplo:
             # Tomar máximo 4 productos por categoría para variedad
-            productos_por_categoria = min(4, len(df_limpio))
-            if productos_procesados + productos_por_categoria > max_productos:
-                productos_por_categoria = max_productos - productos_procesados
-            df_limpio = df_limpio.head(productos_por_categoria)
-        
-        for index, fila in df_limpio.iterrows():
-            if productos_procesados >= max_productos:
-                break
-            try:
-                # Limpiar y calcular precio base (TOTAL / 1.03)
-                total_str = str(fila['TOTAL']).strip()
-                
-                # Manejar casos especiales
-                if pd.isna(fila['TOTAL']) or total_str in ['#VALUE!', 'nan', '']:
-                    precio_base = 0
-                else:
-                    # Limpiar formato: remover espacios, €, y convertir comas a puntos
-                    total_limpio = total_str.replace('€', '').replace(' ', '').replace(',', '.')
-                    try:
-                        precio_total = float(total_limpio)
-                        precio_base = round(precio_total / 1.03, 2) if precio_total > 0 else 0
-                    except ValueError:
-                        precio_base = 0
-                
-                # Crear producto para WooCommerce
-                producto_wc = {
-                    'ID': contador_id,
-                    'Tipo': 'simple',
-                    'SKU': f"SKU-{contador_id:04d}",
-                    'GTIN': '',
-                    'Nombre': str(fila['PRODUCTO']).strip(),
-                    'Publicado': 1,
-                    '¿Está destacado?': 0,
-                    'Visibilidad en el catálogo': 'visible',
-                    'Descripción corta': f"Producto de la categoría {nombre_pagina}",
-                    'Descripción': f"Producto {str(fila['PRODUCTO']).strip()} de la categoría {nombre_pagina}",
-                    'Día en que empieza el precio rebajado': '',
-                    'Día en que termina el precio rebajado': '',
-                    'Estado del impuesto': 'taxable',
-                    'Clase de impuesto': 'standard',
-                    '¿Existencias?': 1,
-                    'Inventario': 100,  # Valor por defecto
-                    'Cantidad de bajo inventario': 5,
-                    '¿Permitir reservas de productos agotados?': 0,
-                    '¿Vendido individualmente?': 0,
-                    'Peso (kg)': '',
-                    'Longitud (cm)': '',
-                    'Anchura (cm)': '',
-                    'Altura (cm)': '',
-                    '¿Permitir valoraciones de clientes?': 1,
-                    'Nota de compra': '',
-                    'Precio rebajado': '',
-                    'Precio normal': precio_base,
-                    'Categorías': nombre_pagina,
-                    'Etiquetas': nombre_pagina.lower().replace(' ', '-'),
-                    'Clase de envío': '',
-                    'Imágenes': '',
-                    'Límite de descargas': '',
-                    'Días de caducidad de la descarga': '',
-                    'Superior': '',
-                    'Productos agrupados': '',
-                    'Ventas dirigidas': '',
-                    'Ventas cruzadas': '',
-                    'URL externa': '',
-                    'Texto del botón': '',
-                    'Posición': contador_id,
-                    'Marcas': ''
-                }
-                
-                # Agregar imagen del producto si está habilitado
-                if agregar_imagenes and image_fetcher:
-                    nombre_producto = str(fila['PRODUCTO']).strip()
-                    imagen_path = image_fetcher.get_woocommerce_compatible_image(nombre_producto, contador_id)
-                    if imagen_path:
-                        # Convertir a ruta relativa para el CSV
-                        producto_wc['Imágenes'] = imagen_path
-                
-                productos_woocommerce.append(producto_wc)
-                contador_id += 1
-                productos_procesados += 1
-                
-            except Exception as e:
-                print(f"Error procesando producto en fila {index}: {e}")
-                continue
+            productos_por_categoria = min(4, max_productos - productos_procesados)
+            # Normalmente basta con revisar las primeras filas; si hay muchas vacías, se revisa la hoja completa
+            primeras_filas = df.head(productos_por_categoria * 2)
+            if primeras_filas['PRODUCTO'].notna().sum() >= productos_por_categoria:
+                filas = primeras_filas
+        
+        # Limpiar datos: descartar filas vacías con una máscara, sin copiar la hoja completa
+        mask = filas['PRODUCTO'].notna().to_numpy()
+        productos = filas['PRODUCTO'][mask]
+        totales = filas['TOTAL'][mask]
+        
+        if solo_ejemplo:
+            productos = productos.head(productos_por_categoria)
+            totales = totales.head(productos_por_categoria)
+        
+        # Saltar páginas sin productos
+        n_productos = len(productos)
+        if n_productos == 0:
+            continue
+        
+        nombres_paginas.append(nombre_pagina)
+        productos_paginas.append(productos)
+        totales_paginas.append(totales)
+        productos_procesados += n_productos
+    
+    # Cada página es independiente: con libros grandes se procesan en paralelo en varios procesos
+    if len(nombres_paginas) > 1 and productos_procesados >= FILAS_MINIMAS_PARALELO:
+        with ProcessPoolExecutor() as executor:
+            paginas_woocommerce = list(executor.map(procesar_pagina, nombres_paginas, productos_paginas, totales_paginas))
+    else:
+        paginas_woocommerce = list(map(procesar_pagina, nombres_paginas, productos_paginas, totales_paginas))
     
     # Crear DataFrame final
-    columnas_wc = crear_estructura_woocommerce()
-    df_woocommerce = pd.DataFrame(productos_woocommerce, columns=columnas_wc)
+    columnas_wc = pd.Index(crear_estructura_woocommerce())
+    if paginas_woocommerce:
+        df_paginas = pd.concat(paginas_woocommerce, ignore_index=True)
+        
+        # Columnas constantes como categóricas de una sola categoría: 1 byte por fila en lugar de 8
+        columnas_constantes = pd.DataFrame({
+            columna: pd.Categorical.from_codes(np.zeros(len(df_paginas), dtype=np.int8), categories=[valor])
+            for columna, valor in PLANTILLA_PRODUCTO_WC.items()
+        })
+        df_woocommerce = pd.concat([df_paginas, columnas_constantes], axis=1).reindex(columns=columnas_wc)
+        # Pocas categorías repetidas en muchas filas: tipo categórico, en el orden de las páginas del libro
+        df_woocommerce['Categorías'] = pd.Categorical(df_woocommerce['Categorías'], categories=nombres_paginas)
+        
+        # IDs consecutivos para todo el archivo, calculados de una sola vez
+        ids = np.arange(1, len(df_woocommerce) + 1)
+        df_woocommerce['ID'] = ids
+        df_woocommerce['SKU'] = ('SKU-' + pd.Series(ids).astype(str).str.zfill(4)).to_numpy()
+        df_woocommerce['Posición'] = ids
+        
+        # Agregar imagen de cada producto si está habilitado (todas las descargas en un solo lote)
+        imagenes = [''] * len(df_woocommerce)
+        if agregar_imagenes and image_fetcher:
+            pendientes = list(zip(df_woocommerce['Nombre'], ids.tolist(), nombres_seguros(df_woocommerce['Nombre'])))
+            rutas_imagenes = image_fetcher.fetch_all(pendientes)
+            imagenes = [rutas_imagenes.get(producto_id) or '' for producto_id in ids.tolist()]
+        df_woocommerce['Imágenes'] = imagenes
+    else:
+        df_woocommerce = pd.DataFrame(columns=columnas_wc)
     
-    # Guardar cache de imágenes si se utilizó
+    # Guardar cache de URLs si se utilizó (las imágenes locales no pasan por él)
     if agregar_imagenes and image_fetcher:
-        image_fetcher.save_cache()
-        print(f"💾 Cache de imágenes guardado en {image_fetcher.cache_file}")
+        if image_fetcher.save_cache():
+            print(f"💾 Cache de imágenes guardado en {image_fetcher.cache_file}")
         
         # Mostrar resumen de imágenes descargadas
         imagenes_con_path = df_woocommerce[df_woocommerce['Imágenes'] != '']['Imágenes']
@@ -472,6 +652,41 @@ def procesar_datos_a_woocommerce(paginas_data, solo_ejemplo=False, agregar_image
     print(f"✅ Procesamiento completado: {len(df_woocommerce)} productos convertidos")
     return df_woocommerce
 
+def escribir_csv_woocommerce(df_woocommerce, nombre_archivo):
+    """
+    Escribe el DataFrame en CSV (UTF-8 con BOM, separador coma)
+    
+    Si PyArrow está disponible se usa su escritor en C++, que trabaja directamente
+    sobre las columnas; si no, o si alguna columna no se puede convertir, se usa pandas.
+    
+    Args:
+        df_woocommerce (pd.DataFrame): DataFrame con datos de WooCommerce
+        nombre_archivo (str): Nombre del archivo de salida
+    """
+    if pa is not None:
+        try:
+            tabla = pa.Table.from_pandas(df_woocommerce, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            tabla = None  # Columnas con tipos mezclados: usar pandas
+        
+        if tabla is not None:
+            with open(nombre_archivo, 'wb') as f:
+                # BOM UTF-8 para compatibilidad con Excel (equivalente a 'utf-8-sig')
+                f.write(codecs.BOM_UTF8)
+                pacsv.write_csv(tabla, f, write_options=pacsv.WriteOptions(include_header=True))
+            return
+    
+    # Exportar a CSV con codificación UTF-8 y separador de coma, por bloques para acotar la memoria
+    df_woocommerce.to_csv(
+        nombre_archivo, 
+        index=False, 
+        encoding='utf-8-sig',  # UTF-8 con BOM para compatibilidad con Excel
+        sep=',',
+        quoting=csv.QUOTE_MINIMAL,
+        lineterminator='\n',
+        chunksize=10000
+    )
+
 def exportar_csv_woocommerce(df_woocommerce, nombre_archivo=None):
     """
     Exporta el DataFrame al formato CSV compatible con WooCommerce
@@ -488,13 +703,7 @@ def exportar_csv_woocommerce(df_woocommerce, nombre_archivo=None):
         nombre_archivo = f"productos_woocommerce_{timestamp}.csv"
     
     try:
-        # Exportar a CSV con codificación UTF-8 y separador de coma
-        df_woocommerce.to_csv(
-            nombre_archivo, 
-            index=False, 
-            encoding='utf-8-sig',  # UTF-8 con BOM para compatibilidad con Excel
-            sep=','
-        )
+        escribir_csv_woocommerce(df_woocommerce, nombre_archivo)
         
         print(f"✅ Archivo exportado exitosamente: {nombre_archivo}")
         print(f"📊 Total de productos: {len(df_woocommerce)}")
@@ -519,15 +728,15 @@ def mostrar_resumen_conversion(df_woocommerce):
     # Resumen por categorías
     categorias = df_woocommerce['Categorías'].value_counts()
     print(f"\nProductos por categoría:")
-    for categoria, cantidad in categorias.items():
-        print(f"  📁 {categoria}: {cantidad} productos")
+    # Un solo print para todas las categorías (puede haber miles)
+    print('\n'.join(f"  📁 {categoria}: {cantidad} productos" for categoria, cantidad in categorias.items()))
     
-    # Resumen de precios
-    precios = df_woocommerce['Precio normal'].astype(float)
+    # Resumen de precios (la columna ya es numérica, se calcula todo en una pasada)
+    precios = df_woocommerce['Precio normal'].agg(['mean', 'min', 'max'])
     print(f"\nResumen de precios:")
-    print(f"  💰 Precio promedio: {precios.mean():.2f}€")
-    print(f"  💰 Precio mínimo: {precios.min():.2f}€")
-    print(f"  💰 Precio máximo: {precios.max():.2f}€")
+    print(f"  💰 Precio promedio: {precios['mean']:.2f}€")
+    print(f"  💰 Precio mínimo: {precios['min']:.2f}€")
+    print(f"  💰 Precio máximo: {precios['max']:.2f}€")
     
     # Mostrar primeros productos como ejemplo
     print(f"\nPrimeros 3 productos convertidos:")
@@ -543,6 +752,12 @@ def main():
     # Verificar flags de comandos
     solo_ejemplo = '--ejemplo' in sys.argv or '-e' in sys.argv
     agregar_imagenes = '--imagenes' in sys.argv or '-i' in sys.argv
+    detallado = '--detallado' in sys.argv or '-d' in sys.argv
+    
+    # El detalle de cada imagen solo se muestra en modo detallado; el resto de librerías
+    # (urllib3) se queda en WARNING para no mezclar sus trazas de conexión con las nuestras
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    log.setLevel(logging.DEBUG if detallado else logging.WARNING)
     
     if solo_ejemplo:
         print("🔬 MODO EJEMPLO ACTIVADO: Se procesarán solo 100 productos variados")
@@ -574,7 +789,7 @@ def main():
         return
     
     # Verificar estructura
-    if verificar_estructura_datos(paginas_data):
+    if verificar_estructura_datos(paginas_data, detallado):
         print("\n✅ OK - El archivo se ha leído correctamente")
         print(f"✅ OK - Se encontraron {len(paginas_data)} página(s)")
         print("✅ OK - Nombres de páginas detectados:")
@@ -614,6 +829,7 @@ if __name__ == "__main__":
         print("\nOpciones:")
         print("  --ejemplo, -e     Procesa solo 100 productos variados para prueba")
         print("  --imagenes, -i    Agrega imágenes automáticamente desde internet")
+        print("  --detallado, -d   Muestra las primeras filas de cada página y el detalle de cada imagen")
         print("  --ayuda, -h       Muestra esta ayuda")
         print("\nEjemplos:")
         print("  python csv_to_woocommerce.py")
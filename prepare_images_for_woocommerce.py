@@ -21,8 +21,11 @@ def create_image_package():
         print("💡 Ejecuta primero: python csv_to_woocommerce.py --ejemplo --imagenes")
         return
     
-    # Contar imágenes
-    image_files = [f for f in os.listdir(images_folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    # Contar imágenes (una sola pasada por la carpeta)
+    image_files = [
+        entry.name for entry in os.scandir(images_folder)
+        if entry.is_file() and entry.name.lower().endswith(('.jpg', '.jpeg', '.png'))
+    ]
     
     if not image_files:
         print("❌ No se encontraron imágenes en la carpeta")
@@ -34,7 +37,8 @@ def create_image_package():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     zip_filename = f"woocommerce_images_{timestamp}.zip"
     
-    with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    # JPEG/PNG ya están comprimidos: guardarlos sin recomprimir (ZIP_STORED)
+    with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_STORED) as zipf:
         for image_file in image_files:
             image_path = os.path.join(images_folder, image_file)
             zipf.write(image_path, image_file)
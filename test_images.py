@@ -6,6 +6,11 @@ Test de conectividad para APIs de imágenes
 
 import requests
 import urllib.parse
+from requests.adapters import HTTPAdapter
+
+# Sesión compartida: todas las pruebas reutilizan las mismas conexiones
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=20, pool_maxsize=50))
 
 def test_image_apis():
     print('🧪 Test de conectividad a APIs de imágenes:')
@@ -14,7 +19,7 @@ def test_image_apis():
         # Test 1: Unsplash Source
         print('\n1. Probando Unsplash Source...')
         url1 = 'https://source.unsplash.com/400x400/?food'
-        response1 = requests.get(url1, timeout=10)
+        response1 = session.get(url1, timeout=10)
         print(f'   Status: {response1.status_code}')
         print(f'   Content-Type: {response1.headers.get("content-type", "N/A")}')
         print(f'   URL final: {response1.url}')
@@ -22,13 +27,13 @@ def test_image_apis():
         # Test 2: Picsum
         print('\n2. Probando Lorem Picsum...')
         url2 = 'https://picsum.photos/400/400?random=123'
-        response2 = requests.head(url2, timeout=10)
+        response2 = session.head(url2, timeout=10)
         print(f'   Status: {response2.status_code}')
         
         # Test 3: Placeholder
         print('\n3. Probando Via Placeholder...')
         url3 = 'https://via.placeholder.com/400x400/ff0000/ffffff?text=Test'
-        response3 = requests.head(url3, timeout=10)
+        response3 = session.head(url3, timeout=10)
         print(f'   Status: {response3.status_code}')
         
         print('\n✅ Tests completados')
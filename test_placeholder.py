@@ -4,21 +4,44 @@
 Test simple del nuevo sistema de placeholder
 """
 
+import functools
 import urllib.parse
+import zlib
 
-def test_simple_placeholder():
-    product_name = "PIPA BLANCA"
+# Paleta de colores
+COLOR_CODES = ('FF6B6B', '4ECDC4', '45B7D1', 'FFA07A', '98D8C8', 'F7DC6F', 'BB8FCE', '85C1E9')
+# El tamaño de la paleta debe ser potencia de dos: el índice se obtiene con una máscara en lugar de un módulo
+COLOR_MASK = len(COLOR_CODES) - 1
+assert len(COLOR_CODES) & COLOR_MASK == 0, "El tamaño de COLOR_CODES debe ser potencia de dos"
+
+# Parte fija de la URL de DummyImage.com para cada color (solo falta añadir el texto)
+URL_PREFIXES = tuple(f"https://dummyimage.com/400x400/{color}/ffffff&text=" for color in COLOR_CODES)
+
+@functools.lru_cache(maxsize=4096)
+def make_placeholder_url(product_name):
+    """
+    Genera la URL placeholder de un producto (función pura: se memoiza por nombre)
+    
+    Args:
+        product_name (str): Nombre del producto
     
-    # Generar color basado en el nombre del producto
-    product_hash = abs(hash(product_name))
-    color_codes = ['FF6B6B', '4ECDC4', '45B7D1', 'FFA07A', '98D8C8', 'F7DC6F', 'BB8FCE', '85C1E9']
-    color = color_codes[product_hash % len(color_codes)]
+    Returns:
+        tuple: (url, color, text)
+    """
+    # Generar color basado en el nombre del producto (CRC32: estable entre ejecuciones, igual que el conversor)
+    product_hash = zlib.crc32(product_name.encode('utf-8'))
+    color_index = product_hash & COLOR_MASK
     
     # Crear texto corto para la imagen
-    text = product_name[:8].replace(' ', '+').upper()
+    text = urllib.parse.quote_plus(product_name[:8].upper())
     
     # Usar DummyImage.com que es muy estable
-    url = f"https://dummyimage.com/400x400/{color}/ffffff&text={text}"
+    return URL_PREFIXES[color_index] + text, COLOR_CODES[color_index], text
+
+def test_simple_placeholder():
+    product_name = "PIPA BLANCA"
+    
+    url, color, text = make_placeholder_url(product_name)
     
     print(f"Producto: {product_name}")
     print(f"URL generada: {url}")
@@ -2,39 +2,125 @@
 import pandas as pd
 import os
 
+try:
+    # PyArrow es opcional: si está instalado las columnas de texto usan cadenas de Arrow
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+DTYPE_TEXTO = 'string[pyarrow]' if pa is not None else 'string'
+
+def listar_directorio(directorio):
+    """Nombres de los archivos de un directorio, leídos con un solo recorrido (None si no existe)"""
+    try:
+        # is_file() usa el tipo que ya devuelve scandir: sin un stat() adicional por entrada
+        with os.scandir(directorio or '.') as entradas:
+            return {entrada.name for entrada in entradas if entrada.is_file()}
+    except OSError:
+        return None
+
+COLUMNAS_VERIFICADAS = ['Nombre', 'Imágenes']
+
+def leer_bloques(archivo):
+    """
+    Lee el CSV por bloques, solo con las columnas Nombre e Imágenes
+    
+    Args:
+        archivo (str): Ruta del CSV exportado
+    
+    Returns:
+        iterator: DataFrames con las filas de cada bloque
+    """
+    if pa is not None:
+        # Lector de Arrow: tokeniza en C++ con varios hilos y descarta las demás columnas al leer;
+        # el archivo se mapea en memoria para evitar copiar cada bloque con read()
+        with pa.memory_map(archivo, 'r') as fuente:
+            lector = pacsv.open_csv(
+                fuente,
+                read_options=pacsv.ReadOptions(block_size=1 << 20),
+                # Los nombres pueden traer saltos de línea dentro de las comillas
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=COLUMNAS_VERIFICADAS,
+                    column_types={columna: pa.string() for columna in COLUMNAS_VERIFICADAS}
+                )
+            )
+            tipos = {pa.string(): pd.StringDtype('pyarrow')}.get
+            for batch in lector:
+                yield batch.to_pandas(types_mapper=tipos)
+    else:
+        yield from pd.read_csv(archivo, chunksize=50_000, usecols=COLUMNAS_VERIFICADAS,
+                               dtype=DTYPE_TEXTO, na_filter=False, encoding='utf-8-sig',
+                               memory_map=True)
+
 def verificar_csv():
     archivo = 'productos_woocommerce_20250707_184957.csv'
+    lineas = []
     try:
-        df = pd.read_csv(archivo, encoding='utf-8-sig')
-        print(f'✅ Archivo verificado: {archivo}')
-        print(f'Total productos: {len(df)}')
+        # Leer por bloques y solo las columnas necesarias: la memoria no crece con el tamaño del archivo
+        total = 0
+        total_con_imagen = 0
+        archivos_existentes = 0
+        ejemplos = []
+        exists_map = {}  # Existencia de cada ruta, consultada una sola vez
+        indices_directorios = {}  # Nombres presentes en cada carpeta de imágenes (None si no existe)
+        for chunk in leer_bloques(archivo):
+            total += len(chunk)
+            # Filtro con los kernels de cadenas en lugar de comparar objeto a objeto
+            with_images = chunk[chunk['Imágenes'].str.len() > 0]
+            total_con_imagen += len(with_images)
+            # Cada carpeta se lista una sola vez y la existencia se resuelve en el índice,
+            # sin un stat() por ruta; una carpeta inexistente se descarta con un solo intento.
+            # El resultado se reutiliza en los ejemplos
+            rutas_locales = with_images['Imágenes']
+            for ruta in rutas_locales.unique():
+                if ruta not in exists_map:
+                    directorio, nombre = os.path.split(ruta)
+                    if directorio not in indices_directorios:
+                        indices_directorios[directorio] = listar_directorio(directorio)
+                    indice = indices_directorios[directorio]
+                    exists_map[ruta] = indice is not None and nombre in indice
+            archivos_existentes += int(rutas_locales.map(exists_map).sum())
+            
+            # Guardar solo los primeros 5 productos con imagen para los ejemplos
+            if len(ejemplos) < 5:
+                ejemplos.extend(zip(with_images['Nombre'].head(5 - len(ejemplos)),
+                                    with_images['Imágenes'].head(5 - len(ejemplos))))
+        
+        lineas.append(f'✅ Archivo verificado: {archivo}')
+        lineas.append(f'Total productos: {total}')
         
-        with_images = df[df['Imágenes'] != '']
-        print(f'Productos con imagen: {len(with_images)}')
-        print(f'Porcentaje con imagen: {len(with_images)/len(df)*100:.1f}%')
+        lineas.append(f'Productos con imagen: {total_con_imagen}')
+        lineas.append(f'Porcentaje con imagen: {total_con_imagen/total*100:.1f}%')
         
-        print('\n📸 Ejemplos de rutas de imágenes:')
-        for i, row in with_images.head(5).iterrows():
-            nombre = row['Nombre'][:25] + '...' if len(row['Nombre']) > 25 else row['Nombre']
-            ruta = row['Imágenes']
-            archivo_existe = os.path.exists(ruta) if ruta else False
+        lineas.append('\n📸 Ejemplos de rutas de imágenes:')
+        for nombre, ruta in ejemplos:
+            nombre = nombre[:25] + '...' if len(nombre) > 25 else nombre
+            archivo_existe = exists_map[ruta]
             status = "✅" if archivo_existe else "❌"
-            print(f'{status} {nombre}: {ruta}')
-            
-        print(f'\n🗂️  Verificación de archivos locales:')
-        rutas_locales = with_images['Imágenes'].tolist()
-        archivos_existentes = sum(1 for ruta in rutas_locales if os.path.exists(ruta))
-        print(f'Archivos que existen localmente: {archivos_existentes} de {len(rutas_locales)}')
+            lineas.append(f'{status} {nombre}: {ruta}')
+        
+        lineas.append(f'\n🗂️  Verificación de archivos locales:')
+        lineas.append(f'Archivos que existen localmente: {archivos_existentes} de {total_con_imagen}')
         
         if archivos_existentes > 0:
-            print(f'\n✅ ÉXITO: Las imágenes se han descargado correctamente')
-            print(f'📁 Carpeta de imágenes: product_images/')
-            print(f'📝 Rutas en CSV: Apuntan a archivos locales')
+            carpetas = ', '.join(f'{directorio or "."}/' for directorio, indice in indices_directorios.items()
+                                 if indice is not None)
+            lineas.append(f'\n✅ ÉXITO: Las imágenes se han descargado correctamente')
+            lineas.append(f'📁 Carpeta de imágenes: {carpetas}')
+            lineas.append(f'📝 Rutas en CSV: Apuntan a archivos locales')
+        elif indices_directorios and all(indice is None for indice in indices_directorios.values()):
+            carpetas = ', '.join(f'{directorio or "."}/' for directorio in indices_directorios)
+            lineas.append(f'\n❌ ERROR: No existe la carpeta de imágenes {carpetas}')
         else:
-            print(f'\n❌ ERROR: No se encontraron los archivos de imagen')
+            lineas.append(f'\n❌ ERROR: No se encontraron los archivos de imagen')
         
     except Exception as e:
-        print(f'Error: {e}')
+        lineas.append(f'Error: {e}')
+    
+    # Toda la salida se escribe de una sola vez
+    print('\n'.join(lineas))
 
 if __name__ == "__main__":
     verificar_csv()